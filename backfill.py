@@ -0,0 +1,132 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from ivasms import (
+    payload_1, payload_2, payload_3, payload_4, payload_5, payload_6,
+    parse_statistics, parse_numbers, parse_message
+)
+from resilience import POLICIES, call
+from scheduler import scheduler
+from transport import make_session
+
+ACCOUNT = os.getenv("IVASMS_EMAIL")
+FIELDS = ["window_from", "window_to", "range", "number", "message", "revenue"]
+
+def date_windows(start, end, days=1):
+    """Split the days start..end (inclusive) into (from_date, to_date) windows of `days` days."""
+    windows = []
+    current = start
+    stop = end + timedelta(days=1)
+    while current < stop:
+        window_end = min(current + timedelta(days=days), stop)
+        windows.append((current.strftime("%m/%d/%Y"), window_end.strftime("%m/%d/%Y")))
+        current = window_end
+    return windows
+
+class StreamWriter:
+    """Write records to CSV or JSON Lines as they arrive, flushing each one."""
+    def __init__(self, f, fmt):
+        self.f = f
+        self.fmt = fmt
+        self.lock = threading.Lock()
+        self.count = 0
+        if fmt == "csv":
+            self.csv = csv.DictWriter(f, fieldnames=FIELDS)
+            self.csv.writeheader()
+
+    def write(self, record):
+        with self.lock:
+            if self.fmt == "csv":
+                self.csv.writerow(record)
+            else:
+                self.f.write(json.dumps(record) + "\n")
+            self.f.flush()
+            self.count += 1
+
+def fetch_window(session, csrf_token, window, writer):
+    """Fetch every SMS in one date window and stream it to the writer."""
+    from_date, to_date = window
+
+    def request(func, *args):
+        # Backfill priority only orders requests inside this process; a monitor
+        # running elsewhere has its own scheduler and does not get precedence
+        return call(func, session, csrf_token, *args, policy=POLICIES["backfill"], account=ACCOUNT)
+
+    response = request(payload_4, from_date, to_date)
+    ranges = parse_statistics(response.text)
+    for range_data in ranges:
+        range_name = range_data["range_name"]
+        response = request(payload_5, to_date, range_name, from_date)
+        for number_data in parse_numbers(response.text):
+            response = request(payload_6, to_date, number_data["number"], range_name, from_date)
+            message_data = parse_message(response.text)
+            writer.write({
+                "window_from": from_date,
+                "window_to": to_date,
+                "range": range_name,
+                "number": number_data["number"],
+                "message": message_data["message"],
+                "revenue": message_data["revenue"]
+            })
+    return len(ranges)
+
+def backfill(start, end, out, fmt="jsonl", window_days=1, workers=4, rate=2.0):
+    """Fetch history for [start, end] with concurrent windows under the request scheduler's budget."""
+    windows = date_windows(start, end, window_days)
+    # This process has its own scheduler, so the account budget is the only thing
+    # keeping backfill from piling onto the live monitor's requests
+    if rate > scheduler.account_rate:
+        print(f"--rate {rate} capped at IVASMS_ACCOUNT_RPS={scheduler.account_rate}", file=sys.stderr)
+        rate = scheduler.account_rate
+    scheduler.set_rates(global_rate=rate)
+    writer = StreamWriter(out, fmt)
+
+    with make_session() as session:
+        tokens = call(payload_1, session, policy=POLICIES["login"], account=ACCOUNT)
+        call(payload_2, session, tokens["_token"], ACCOUNT, os.getenv("IVASMS_PASSWORD"), policy=POLICIES["login"], account=ACCOUNT)
+        response, csrf_token = call(payload_3, session, policy=POLICIES["page"], account=ACCOUNT)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(fetch_window, session, csrf_token, w, writer): w for w in windows}
+            for future in as_completed(futures):
+                window = futures[future]
+                try:
+                    ranges = future.result()
+                    print(f"Window {window[0]} - {window[1]}: {ranges} range(s)", file=sys.stderr)
+                except Exception as e:
+                    print(f"Window {window[0]} - {window[1]} failed: {str(e)}", file=sys.stderr)
+
+    print(f"Exported {writer.count} SMS from {len(windows)} window(s)", file=sys.stderr)
+    return writer.count
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill IVASMS history for a date range.")
+    parser.add_argument("--from", dest="start", required=True, help="first day, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", default=datetime.now().strftime("%Y-%m-%d"), help="last day, YYYY-MM-DD (default: today)")
+    parser.add_argument("--window-days", type=int, default=1, help="days per request window")
+    parser.add_argument("--workers", type=int, default=4, help="windows fetched concurrently")
+    parser.add_argument("--rate", type=float, default=2.0, help="request budget in requests per second")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="output format (default: from --output extension)")
+    parser.add_argument("--output", default="-", help="output file, '-' for stdout")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    start = datetime.strptime(args.start, "%Y-%m-%d")
+    end = datetime.strptime(args.end, "%Y-%m-%d")
+    fmt = args.format or ("csv" if args.output.endswith(".csv") else "jsonl")
+
+    if args.output == "-":
+        backfill(start, end, sys.stdout, fmt, args.window_days, args.workers, args.rate)
+    else:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            backfill(start, end, f, fmt, args.window_days, args.workers, args.rate)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Benchmark the HTTP/1.1 and HTTP/2 transports against local stand-in servers.
+
+    python bench_transport.py --requests 200 --concurrency 8
+
+Both servers answer every request with the same body after --delay-ms and
+charge --handshake-ms on each new connection, standing in for the TCP+TLS
+setup a real IVASMS connection costs. The report compares request latency,
+wall time and how many connections each transport opened. Needs httpx[http2].
+"""
+import argparse
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import h2.config
+import h2.connection
+import h2.events
+
+from transport import HTTP2Session, make_session
+
+BODY = b"<div class='card card-body mb-1 pointer'>" + b"x" * 4000 + b"</div>"
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    def add(self, connections=0, requests=0):
+        with self.lock:
+            self.connections += connections
+            self.requests += requests
+
+def start_http1_server(stats, delay, handshake):
+    """HTTP/1.1 keep-alive stand-in on a background thread; returns (stop, base URL)"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            stats.add(connections=1)
+            self.fresh = True
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            stats.add(requests=1)
+            time.sleep(delay + (handshake if self.fresh else 0))
+            self.fresh = False
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        do_GET = do_POST
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown, f"http://127.0.0.1:{server.server_address[1]}"
+
+class H2Protocol(asyncio.Protocol):
+    """Cleartext HTTP/2 (prior knowledge) stand-in serving many streams per connection"""
+    def __init__(self, stats, delay, handshake):
+        self.stats = stats
+        self.delay = delay
+        self.conn = h2.connection.H2Connection(config=h2.config.H2Configuration(client_side=False))
+        self.ready_at = time.monotonic() + handshake
+
+    def connection_made(self, transport):
+        self.stats.add(connections=1)
+        self.transport = transport
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data):
+        loop = asyncio.get_running_loop()
+        for event in self.conn.receive_data(data):
+            if isinstance(event, h2.events.DataReceived):
+                self.conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+            elif isinstance(event, h2.events.StreamEnded):
+                self.stats.add(requests=1)
+                wait = max(self.delay, self.ready_at - time.monotonic())
+                loop.call_later(wait, self.respond, event.stream_id)
+        self.transport.write(self.conn.data_to_send())
+
+    def respond(self, stream_id):
+        self.conn.send_headers(stream_id, [
+            (":status", "200"),
+            ("content-type", "text/html"),
+            ("content-length", str(len(BODY))),
+        ])
+        self.conn.send_data(stream_id, BODY, end_stream=True)
+        self.transport.write(self.conn.data_to_send())
+
+def start_http2_server(stats, delay, handshake):
+    """Run the HTTP/2 stand-in on its own event loop thread; returns (stop, base URL)"""
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(
+        loop.create_server(lambda: H2Protocol(stats, delay, handshake), "127.0.0.1", 0)
+    )
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return lambda: loop.call_soon_threadsafe(server.close), f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+def run(session, url, total, concurrency):
+    """Fire `total` drill-down-sized POSTs from `concurrency` threads"""
+    def one(i):
+        start = time.monotonic()
+        response = session.post(f"{url}/portal/sms/received/getsms/number", data={"_token": "t", "range": str(i)}, timeout=30)
+        response.raise_for_status()
+        return time.monotonic() - start
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(total)))
+    return latencies, time.monotonic() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare HTTP/1.1 and HTTP/2 transports on a local stand-in.")
+    parser.add_argument("--requests", type=int, default=200, help="requests per transport")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent requests")
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="server think time per request")
+    parser.add_argument("--handshake-ms", type=float, default=100.0, help="extra cost of each new connection")
+    args = parser.parse_args()
+    delay, handshake = args.delay_ms / 1000, args.handshake_ms / 1000
+
+    print(f"{'transport':<10} {'conns':>6} {'wall s':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name in ("http1", "http2"):
+        stats = Stats()
+        if name == "http1":
+            stop, url = start_http1_server(stats, delay, handshake)
+            session = make_session("http1")
+        else:
+            stop, url = start_http2_server(stats, delay, handshake)
+            # The stand-in speaks cleartext HTTP/2 only, so skip the HTTP/1.1 upgrade path
+            session = HTTP2Session(http1=False)
+        try:
+            with session:
+                latencies, wall = run(session, url, args.requests, args.concurrency)
+        finally:
+            stop()
+
+        print(f"{name:<10} {stats.connections:>6} {wall:>8.2f} {len(latencies) / wall:>8.1f} "
+              f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f}")
+
+if __name__ == "__main__":
+    main()
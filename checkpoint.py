@@ -0,0 +1,25 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+def save_checkpoint(path, data):
+    """Write the checkpoint atomically so a kill mid-write never leaves a torn file"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    """Return the saved checkpoint, or None if there is none or it cannot be read"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"[CHECKPOINT] Could not read {path}: {e}")
+        return None
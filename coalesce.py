@@ -0,0 +1,53 @@
+import asyncio
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """Share one in-flight call per key and serve recent results from a TTL cache"""
+    def __init__(self, ttl=5.0):
+        self.ttl = ttl
+        self._inflight = {}  # key -> asyncio.Future of the running call
+        self._cache = {}  # key -> (monotonic timestamp, result)
+
+    async def do(self, key, func, *args, ttl=None):
+        """Return func(*args), joining an in-flight call or a cached result for key.
+
+        Blocking functions run in a worker thread so the event loop stays free.
+        Pass ttl=0 to skip the cache but still join a call already in flight.
+        """
+        ttl = self.ttl if ttl is None else ttl
+        cached = self._cache.get(key)
+        if cached and ttl > 0 and time.monotonic() - cached[0] < ttl:
+            logger.debug(f"[FLIGHT] Cache hit for {key}")
+            return cached[1]
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(key, func, *args))
+            self._inflight[key] = future
+        else:
+            logger.debug(f"[FLIGHT] Joining in-flight call for {key}")
+
+        # Shield so one caller being cancelled does not cancel the shared call
+        return await asyncio.shield(future)
+
+    async def _run(self, key, func, *args):
+        try:
+            if inspect.iscoroutinefunction(func):
+                result = await func(*args)
+            else:
+                result = await asyncio.to_thread(func, *args)
+            self._cache[key] = (time.monotonic(), result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, key=None):
+        """Drop the cached result for key, or every cached result"""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
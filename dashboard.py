@@ -0,0 +1,129 @@
+import logging
+import os
+import shutil
+import sys
+import threading
+from collections import deque
+from datetime import datetime
+
+class DashboardHandler(logging.Handler):
+    """Route logging records into a dashboard's log panel instead of stderr"""
+    def __init__(self, dashboard, level=logging.WARNING):
+        super().__init__(level)
+        self.dashboard = dashboard
+
+    def emit(self, record):
+        try:
+            self.dashboard.log(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+class Dashboard:
+    """Live console view for main.py that redraws in place with ANSI escapes.
+
+    Only lines that changed since the last frame are rewritten, and nothing is
+    spawned. When stdout is not a TTY (or DASHBOARD=0) the dashboard is off
+    and log() falls back to plain print so redirected output stays readable.
+    """
+    def __init__(self, stream=None, log_lines=8):
+        self.stream = stream or sys.stdout
+        self.enabled = self.stream.isatty() and os.getenv("DASHBOARD", "1") != "0"
+        self.ranges = []
+        self.window = ""
+        self.last_sms = None
+        self.latency = None
+        self.polls = 0
+        self.error = None
+        self.logs = deque(maxlen=log_lines)
+        self._lines = []
+        # Log records can arrive from worker threads mid-frame
+        self._lock = threading.RLock()
+        if self.enabled:
+            self._enable_ansi()
+            self.stream.write("\x1b[2J\x1b[H")  # Clear once; later frames only patch lines
+
+    def _enable_ansi(self):
+        """Turn on ANSI escape handling in the Windows console"""
+        if os.name != "nt":
+            return
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetConsoleMode(kernel32.GetStdHandle(-11), 7)
+        except Exception:
+            self.enabled = False
+
+    def log(self, message):
+        if not self.enabled:
+            print(message)
+            return
+        with self._lock:
+            self.logs.append(f"{datetime.now().strftime('%H:%M:%S')} {message}")
+            self.render()
+
+    def capture_logging(self, level=logging.WARNING):
+        """Show logging records (e.g. [RETRY], [CIRCUIT]) in the log panel so they do not print over the frame"""
+        if not self.enabled:
+            return
+        handler = DashboardHandler(self, level)
+        handler.setFormatter(logging.Formatter("%(levelname)s %(message)s"))
+        logging.getLogger().addHandler(handler)
+
+    def update(self, ranges=None, window=None, latency=None, error=None, last_sms=None):
+        """Record the outcome of a poll; pass error=None with latency to clear a previous error"""
+        if ranges is not None:
+            self.ranges = ranges
+        if window is not None:
+            self.window = window
+        if latency is not None:
+            self.latency = latency
+            self.polls += 1
+            self.error = None
+        if error is not None:
+            self.error = error
+        if last_sms is not None:
+            self.last_sms = last_sms
+
+    def build(self):
+        """Return the frame as a list of lines"""
+        latency = f"{self.latency:.2f}s" if self.latency is not None else "-"
+        state = f"ERROR: {self.error}" if self.error else "OK"
+        lines = [
+            f"IVASMS Monitor  {self.window}  {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+            f"Status: {state}   Poll latency: {latency}   Polls: {self.polls}",
+        ]
+        if self.last_sms:
+            sms = self.last_sms
+            lines.append(f"Last SMS: {sms['timestamp']} +{sms['number']} [{sms['range']}] {sms['message']}")
+        else:
+            lines.append("Last SMS: -")
+        lines.append("")
+        lines.append(f"{'Range':<32} {'Count':>7} {'Paid':>7} {'Unpaid':>7} {'Revenue':>10}")
+        for r in self.ranges:
+            lines.append(f"{r['range_name'][:32]:<32} {r['count']:>7} {r['paid']:>7} {r['unpaid']:>7} {r['revenue']:>10.2f}")
+        total = sum(r["count"] for r in self.ranges)
+        revenue = sum(r["revenue"] for r in self.ranges)
+        lines.append(f"{'Total':<32} {total:>7} {'':>7} {'':>7} {revenue:>10.2f}")
+        lines.append("")
+        lines.extend(self.logs)
+        return lines
+
+    def render(self):
+        """Redraw only the lines that differ from the previous frame"""
+        if not self.enabled:
+            return
+        with self._lock:
+            width = shutil.get_terminal_size().columns
+            lines = [line[:width] for line in self.build()]
+            out = []
+            for row, line in enumerate(lines):
+                if row >= len(self._lines) or self._lines[row] != line:
+                    out.append(f"\x1b[{row + 1};1H{line}\x1b[K")
+            if len(lines) < len(self._lines):
+                # Frame got shorter: clear everything below it
+                out.append(f"\x1b[{len(lines) + 1};1H\x1b[J")
+            if out:
+                out.append(f"\x1b[{len(lines) + 1};1H")
+                self.stream.write("".join(out))
+                self.stream.flush()
+            self._lines = lines
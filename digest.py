@@ -0,0 +1,104 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Telegram rejects messages longer than this
+TELEGRAM_LIMIT = 4096
+
+def entry_room(header, footer="", limit=TELEGRAM_LIMIT):
+    """Longest entry build_digests can place without cutting it"""
+    return limit - len(header) - len(footer) - 4
+
+def build_digests(entries, header, footer="", limit=TELEGRAM_LIMIT):
+    """Pack formatted entries into as few messages as fit Telegram's size limit.
+
+    Longer entries are cut blindly, which can break their markup; shorten the
+    content to entry_room() before formatting it.
+    """
+    overhead = limit - entry_room(header, footer, limit)
+    messages = []
+    current = []
+    size = overhead
+    for entry in entries:
+        if len(entry) > limit - overhead:
+            entry = entry[:limit - overhead - 3] + "..."
+        if current and size + len(entry) + 1 > limit:
+            messages.append(current)
+            current = []
+            size = overhead
+        current.append(entry)
+        size += len(entry) + 1
+
+    if current:
+        messages.append(current)
+    return [f"{header}\n\n" + "\n".join(chunk) + (f"\n\n{footer}" if footer else "") for chunk in messages]
+
+class Coalescer:
+    """Merge SMS arriving within `window` seconds into one batch per delivery.
+
+    The first SMS starts the window; everything added before it closes is sent
+    together. Reaching `burst` pending SMS flushes at once instead of waiting.
+    window=0 is individual mode: every SMS is delivered as soon as it arrives.
+    Each SMS can carry an ack(sent) callback, called once its batch was sent
+    (sent=True) or failed (sent=False).
+    """
+    def __init__(self, send, window=3.0, burst=5):
+        self.send = send  # async callable taking a list of SMS
+        self.window = window
+        self.burst = burst
+        self.pending = []  # (sms, ack)
+        self.queued = []  # batches taken from pending, waiting for the send lock
+        self.sending = []  # the batch currently being sent
+        self._timer = None
+        self._tasks = set()  # flushes started by the window timer
+        self._lock = asyncio.Lock()
+
+    async def add(self, sms, ack=None):
+        self.pending.append((sms, ack))
+        if self.window <= 0 or len(self.pending) >= self.burst:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.window, self._flush_later)
+
+    def _flush_later(self):
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def unsent(self):
+        """SMS not yet fully delivered: the batch being sent, batches waiting their turn and pending"""
+        waiting = [entry for batch in self.queued for entry in batch]
+        return [sms for sms, _ in self.sending + waiting + self.pending]
+
+    async def flush(self):
+        """Deliver everything pending as one batch.
+
+        Returns once this batch and every batch started before it were sent, so
+        flushing with nothing pending still waits out a send already running.
+        """
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self.queued.append(batch)
+
+        # Keep batches in arrival order even if a timer and a burst flush overlap
+        async with self._lock:
+            if not batch:
+                return
+            self.queued.remove(batch)
+            self.sending = batch
+            try:
+                await self.send([sms for sms, _ in batch])
+                sent = True
+            except Exception as e:
+                logger.error(f"[DIGEST] Failed to deliver {len(batch)} SMS: {e}")
+                sent = False
+            self.sending = []
+            for _, ack in batch:
+                if ack:
+                    ack(sent)
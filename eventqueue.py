@@ -0,0 +1,67 @@
+import json
+import sqlite3
+import threading
+import time
+
+class LocalQueue:
+    """Durable SQLite-backed queue shared by the scraper and bot processes.
+
+    Rows stay in the table until the consumer acks them, so events survive a
+    crash or restart of either side (at-least-once delivery). A small state
+    table next to the queue holds the latest snapshots published by the scraper.
+    """
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def put(self, kind, payload):
+        """Append an event; it is on disk when this returns"""
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO {self.name} (kind, payload, created) VALUES (?, ?, ?)",
+                (kind, json.dumps(payload), time.time())
+            )
+
+    def get(self, limit=50):
+        """Return up to limit unacked events as (id, kind, payload), oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, kind, payload FROM {self.name} ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row_id, kind, json.loads(payload)) for row_id, kind, payload in rows]
+
+    def ack(self, ids):
+        """Remove handled events"""
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany(f"DELETE FROM {self.name} WHERE id = ?", [(i,) for i in ids])
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+
+    def set_state(self, key, value):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO state (key, value, updated) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+
+    def get_state(self, key):
+        """Return (value, updated timestamp), or (None, None) if never set"""
+        with self._lock:
+            row = self._conn.execute("SELECT value, updated FROM state WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None, None
+        return json.loads(row[0]), row[1]
@@ -1,6 +1,6 @@
-import requests
 import re
 import json
+import hashlib
 import time
 import logging
 from datetime import datetime
@@ -8,11 +8,24 @@ from bs4 import BeautifulSoup
 import os
 from telegram import Bot, InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram.error import BadRequest, RetryAfter
 import asyncio
 import random
+from collections import deque
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import sys
+import signal
 import threading
+from coalesce import SingleFlight
+from resilience import POLICIES, call, get_breaker
+from eventqueue import LocalQueue
+from digest import Coalescer, build_digests, entry_room
+from transport import make_session, export_cookies, import_cookies
+from checkpoint import save_checkpoint, load_checkpoint
+from ivasms import (
+    payload_3, payload_4, payload_5, payload_6,
+    parse_statistics, parse_numbers, parse_message, current_dates
+)
 
 # Set up logging
 logging.basicConfig(
@@ -25,6 +38,36 @@ logger = logging.getLogger(__name__)
 ADMIN_IDS = [5326153007]  # Your admin ID
 bot_users = set()
 
+# How long /stats may reuse a recent scrape instead of hitting IVASMS again
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "30"))
+
+# Live board: one pinned message per chat, edited at most every BOARD_INTERVAL seconds
+BOARD_INTERVAL = float(os.getenv("BOARD_INTERVAL", "15"))
+boards = {}  # chat id -> message id of the board
+board_texts = {}  # chat id -> text last shown on the board
+recent_sms = deque(maxlen=5)
+
+# SMS arriving within DIGEST_WINDOW seconds go out as one digest per chat;
+# DIGEST_BURST pending SMS flush at once. DIGEST_WINDOW=0 sends every SMS on its own.
+DIGEST_WINDOW = float(os.getenv("DIGEST_WINDOW", "3"))
+DIGEST_BURST = int(os.getenv("DIGEST_BURST", "20"))
+
+# Graceful shutdown: on SIGTERM stop polling, drain sends for up to SHUTDOWN_DEADLINE
+# seconds, then checkpoint state to CHECKPOINT_PATH (default checkpoint_<mode>.json)
+# for a warm restart. The checkpoint is also refreshed every CHECKPOINT_INTERVAL seconds.
+SHUTDOWN_DEADLINE = float(os.getenv("SHUTDOWN_DEADLINE", "20"))
+CHECKPOINT_INTERVAL = float(os.getenv("CHECKPOINT_INTERVAL", "60"))
+CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH")
+shutdown_event = asyncio.Event()
+
+# Architecture mode: "all" runs everything in one process, "scraper" and "bot"
+# run each half on its own, connected by a durable SQLite queue at QUEUE_PATH.
+# The first command-line argument overrides RUN_MODE.
+RUN_MODE = os.getenv("RUN_MODE", "all").lower()
+QUEUE_PATH = os.getenv("QUEUE_PATH", "ivasms_queue.db")
+# The scraper publishes its state every second; older than this means it is not running
+SCRAPER_STALE_AFTER = float(os.getenv("SCRAPER_STALE_AFTER", "10"))
+
 class HealthHandler(BaseHTTPRequestHandler):
     def do_GET(self):
         self.send_response(200)
@@ -43,10 +86,6 @@ def run_health_server():
     logger.info(f"[HEALTH] Server listening on port {port}")
     server.serve_forever()
 
-# Start health server in background
-health_thread = threading.Thread(target=run_health_server, daemon=True)
-health_thread.start()
-
 # Updated keyboard with your channels
 def get_keyboard():
     keyboard = [
@@ -56,17 +95,24 @@ def get_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 def get_powered_by():
-    return f"  xs {datetime.now().year}"
+    return f"©  xs {datetime.now().year}"
 
 class IVASMSMonitor:
     def __init__(self):
         self.email = os.getenv("IVASMS_EMAIL")
         self.password = os.getenv("IVASMS_PASSWORD")
-        self.session = requests.Session()
+        self.session = make_session()
         self.last_sms = {}  # Store last 100 SMS to avoid duplicates
+        self.undelivered = []  # SMS found by check_sms that were not handed to delivery yet
+        self.state_lock = threading.Lock()  # guards last_sms, undelivered and range_counts
         self.logged_in = False
         self.login_attempts = 0
         self.max_sms_store = 100
+        self.breaker = get_breaker(self.email)
+        self.csrf_token = None
+        self.range_counts = None  # range name -> SMS count at the last poll, None until the first poll
+        self.ranges = []  # parse_statistics output of the last poll
+        self.from_date, self.to_date = current_dates()
         
         # Headers to mimic browser
         self.headers = {
@@ -77,18 +123,30 @@ class IVASMSMonitor:
             'Connection': 'keep-alive',
             'Upgrade-Insecure-Requests': '1',
         }
+    
+    def _request(self, method, url, **kwargs):
+        """Send a request, raising on statuses worth retrying (429 and 5xx)"""
+        response = self.session.request(method, url, timeout=30, **kwargs)
+        if response.status_code == 429 or response.status_code >= 500:
+            response.raise_for_status()
+        return response
         
     def login(self):
         """Login to IVASMS using requests"""
+        if not self.breaker.allow():
+            logger.warning(f"[LOGIN] Circuit open, next attempt in {self.breaker.retry_after():.0f}s")
+            return False
+        
         try:
             logger.info(f"[LOGIN] Attempting login for {self.email}")
             
             # Get login page for token
-            response = self.session.get("https://www.ivasms.com/login", headers=self.headers, timeout=30)
+            response = call(self._request, "GET", "https://www.ivasms.com/login", policy=POLICIES["login"], account=self.email, headers=self.headers)
             
             if response.status_code != 200:
                 logger.error(f"[LOGIN] Failed to get login page: {response.status_code}")
                 self.login_attempts += 1
+                self.breaker.record_failure()
                 return False
             
             # Extract CSRF token
@@ -96,6 +154,7 @@ class IVASMSMonitor:
             if not token_match:
                 logger.error("[LOGIN] Could not find CSRF token")
                 self.login_attempts += 1
+                self.breaker.record_failure()
                 return False
             
             _token = token_match.group(1)
@@ -116,113 +175,171 @@ class IVASMSMonitor:
                 "Referer": "https://www.ivasms.com/login"
             })
             
-            login_response = self.session.post(
+            login_response = call(
+                self._request,
+                "POST",
                 "https://www.ivasms.com/login",
+                policy=POLICIES["login"],
+                account=self.email,
                 data=login_data,
                 headers=login_headers,
-                allow_redirects=True,
-                timeout=30
+                allow_redirects=True
             )
             
             # Check if login successful
             if "dashboard" in login_response.url or "portal" in login_response.url:
                 self.logged_in = True
                 self.login_attempts = 0
+                self.csrf_token = None
+                self.breaker.record_success()
                 logger.info("[LOGIN]  Successfully logged in")
                 return True
             else:
                 logger.error("[LOGIN] Login failed - check credentials")
                 self.login_attempts += 1
+                self.breaker.record_failure()
                 return False
                 
         except Exception as e:
             logger.error(f"[LOGIN] Error: {e}")
             self.login_attempts += 1
+            self.breaker.record_failure()
             return False
     
+    def remember(self, sms):
+        """Mark an SMS as seen once it was handed to delivery, keeping only the newest max_sms_store ids"""
+        with self.state_lock:
+            self.undelivered = [s for s in self.undelivered if s['id'] != sms['id']]
+            self.last_sms[sms['id']] = datetime.now().isoformat()
+            if len(self.last_sms) > self.max_sms_store:
+                oldest = min(self.last_sms.keys(), key=lambda k: self.last_sms[k])
+                del self.last_sms[oldest]
+    
+    def claim(self, sms):
+        """Take an SMS found by check_sms for delivery; False if another caller already took it.
+
+        monitor_loop and a /check joining the same poll get the same list, and
+        each SMS must go out once. Call deliver right after a successful claim:
+        it queues the SMS before its first await, so a checkpoint still sees it.
+        """
+        with self.state_lock:
+            if not any(s['id'] == sms['id'] for s in self.undelivered):
+                return False
+        self.remember(sms)
+        return True
+    
+    def _poll_summary(self):
+        """Fetch per-range counts from the /getsms summary, or None if the session expired"""
+        if not self.csrf_token:
+            # Only the CSRF token needs the full /sms/received page, once per session
+            _, self.csrf_token = call(payload_3, self.session, policy=POLICIES["page"], breaker=self.breaker)
+        
+        response = call(
+            payload_4, self.session, self.csrf_token, self.from_date, self.to_date,
+            policy=POLICIES["poll"], breaker=self.breaker
+        )
+        if response.url.endswith("/login"):
+            logger.warning("[SMS] Session expired, logging in again")
+            self.logged_in = False
+            self.csrf_token = None
+            return None
+        return parse_statistics(response.text)
+    
+    def _fetch_range_sms(self, range_name, count, found):
+        """Drill down into a range, appending its newest `count` unseen SMS to found.
+
+        SMS are appended as they are fetched, so a failure partway through keeps
+        the ones already collected. They are not marked seen here: callers call
+        remember() after delivery, so re-drilling a failed range skips only SMS
+        that really went out.
+        """
+        response = call(
+            payload_5, self.session, self.csrf_token, self.to_date, range_name,
+            policy=POLICIES["drilldown"], breaker=self.breaker
+        )
+        numbers = parse_numbers(response.text)
+        
+        for number_data in numbers[-count:][::-1]:  # Newest first
+            response = call(
+                payload_6, self.session, self.csrf_token, self.to_date, number_data["number"], range_name,
+                policy=POLICIES["drilldown"], breaker=self.breaker
+            )
+            message_data = parse_message(response.text)
+            
+            # hash() of a str changes per process, so ids would never match a checkpoint
+            digest = hashlib.sha1(message_data['message'].encode()).hexdigest()
+            sms_id = f"{range_name}:{number_data['number_id']}:{digest}"
+            if sms_id in self.last_sms:
+                continue
+            
+            found.append({
+                'from': number_data['number'],
+                'message': message_data['message'],
+                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                'id': sms_id,
+                'range': range_name,
+                'revenue': message_data['revenue']
+            })
+    
     def check_sms(self):
-        """Check for new SMS messages"""
+        """Check for new SMS: poll the range summary, then drill down only into ranges that grew"""
         if not self.logged_in:
             if not self.login():
                 return []
         
+        new_sms = []
+        failed = False
         try:
-            # Go to SMS received page
-            response = self.session.get(
-                "https://www.ivasms.com/portal/sms/received", 
-                headers=self.headers, 
-                timeout=30
-            )
+            # Follow the day over; the portal's counts restart from zero
+            if current_dates() != (self.from_date, self.to_date):
+                self.from_date, self.to_date = current_dates()
+                if self.range_counts is not None:
+                    self.range_counts = {}
             
-            if response.status_code != 200:
-                logger.error(f"[SMS] Failed to get SMS page: {response.status_code}")
+            ranges = self._poll_summary()
+            if ranges is None:
                 return []
+            self.ranges = ranges
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            new_sms = []
+            # The first poll only records the baseline so a restart does not re-send old SMS
+            if self.range_counts is None:
+                self.range_counts = {r["range_name"]: r["count"] for r in ranges}
+                logger.info(f"[SMS] Baseline recorded for {len(ranges)} range(s)")
+                return []
             
-            # Method 1: Look for table rows (most common)
-            rows = soup.find_all('tr')
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 3:
-                    # Create unique ID for this SMS
-                    sms_content = ' '.join([c.get_text(strip=True) for c in cells])
-                    sms_id = str(hash(sms_content))
-                    
-                    if sms_id not in self.last_sms:
-                        self.last_sms[sms_id] = datetime.now().isoformat()
-                        
-                        # Clean up old SMS
-                        if len(self.last_sms) > self.max_sms_store:
-                            oldest = min(self.last_sms.keys(), key=lambda k: self.last_sms[k])
-                            del self.last_sms[oldest]
-                        
-                        sms_data = {
-                            'from': cells[0].get_text(strip=True) if len(cells) > 0 else 'Unknown',
-                            'message': cells[1].get_text(strip=True) if len(cells) > 1 else 'No message',
-                            'time': cells[2].get_text(strip=True) if len(cells) > 2 else datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                            'id': sms_id
-                        }
-                        new_sms.append(sms_data)
+            counts = dict(self.range_counts)
+            for range_data in ranges:
+                range_name = range_data["range_name"]
+                count_diff = range_data["count"] - counts.get(range_name, 0)
+                if count_diff > 0:
+                    logger.info(f"[SMS] {range_name}: +{count_diff}")
+                    try:
+                        self._fetch_range_sms(range_name, count_diff, new_sms)
+                    except Exception as e:
+                        # Keep the old count so the next poll drills into this range again
+                        logger.error(f"[SMS] Drill-down into {range_name} failed: {e}")
+                        failed = True
+                        continue
+                # Only advance the baseline once the drill-down succeeded
+                counts[range_name] = range_data["count"]
             
-            # Method 2: Look for div cards if no table rows found
-            if not new_sms:
-                cards = soup.find_all('div', class_=re.compile(r'card|sms-item|message-item'))
-                for card in cards:
-                    card_text = card.get_text(strip=True)
-                    if card_text and len(card_text) > 10:
-                        sms_id = str(hash(card_text[:200]))
-                        
-                        if sms_id not in self.last_sms:
-                            self.last_sms[sms_id] = datetime.now().isoformat()
-                            
-                            if len(self.last_sms) > self.max_sms_store:
-                                oldest = min(self.last_sms.keys(), key=lambda k: self.last_sms[k])
-                                del self.last_sms[oldest]
-                            
-                            # Try to extract sender
-                            sender = 'Unknown'
-                            sender_match = re.search(r'(?:From|Sender)[:\s]+([^\n]+)', card_text)
-                            if sender_match:
-                                sender = sender_match.group(1).strip()
-                            
-                            sms_data = {
-                                'from': sender,
-                                'message': card_text[:300] + '...' if len(card_text) > 300 else card_text,
-                                'time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                                'id': sms_id
-                            }
-                            new_sms.append(sms_data)
+            # Commit the counters together with the SMS they account for, so a
+            # checkpoint taken while this poll runs sees neither
+            with self.state_lock:
+                self.range_counts = counts
+                self.undelivered.extend(new_sms)
             
             if new_sms:
                 logger.info(f"[SMS] Found {len(new_sms)} new message(s)")
             
-            return new_sms
-            
         except Exception as e:
             logger.error(f"[SMS] Error: {e}")
-            return []
+            failed = True
+        
+        if failed:
+            # A stale token is the usual cause of a failing XHR; fetch a fresh one next time
+            self.csrf_token = None
+        return new_sms
     
     def get_stats(self):
         """Get account statistics"""
@@ -230,7 +347,7 @@ class IVASMSMonitor:
             return " Not logged in"
         
         try:
-            response = self.session.get("https://www.ivasms.com/portal", headers=self.headers, timeout=30)
+            response = call(self._request, "GET", "https://www.ivasms.com/portal", policy=POLICIES["page"], breaker=self.breaker, headers=self.headers)
             soup = BeautifulSoup(response.text, 'html.parser')
             
             # Try to find balance
@@ -255,8 +372,47 @@ class IVASMSMonitor:
 # Initialize monitor
 monitor = IVASMSMonitor()
 
-# Initial login attempt
-monitor.login()
+# Concurrent callers for the same scrape share one request
+flight = SingleFlight()
+
+# Scraper -> bot SMS events and bot -> scraper commands, opened by main() in split mode
+events = commands = None
+
+# Outbound SMS coalescer of the bot side, created by main()
+coalescer = None
+
+def monitor_state():
+    """Scraper status, read from the queue's state table when the scraper runs separately"""
+    if RUN_MODE == "bot":
+        state, updated = events.get_state("monitor")
+        if state is None:
+            return {"logged_in": False, "sms_tracked": 0, "login_attempts": 0, "circuit": "unknown", "ranges": [], "scraper": "Down (never seen)"}
+        age = time.time() - updated
+        if age > SCRAPER_STALE_AFTER:
+            # Keep the last counts but do not claim a login the dead scraper no longer holds
+            return dict(state, logged_in=False, scraper=f"Down (last seen {age:.0f}s ago)")
+        return dict(state, scraper="Up")
+    return {
+        "logged_in": monitor.logged_in,
+        "sms_tracked": len(monitor.last_sms),
+        "login_attempts": monitor.login_attempts,
+        "circuit": monitor.breaker.state,
+        "ranges": monitor.ranges,
+    }
+
+async def request_from_scraper(kind, timeout=20):
+    """Ask the scraper process for fresh state and wait for it to publish it"""
+    cached, updated = events.get_state(kind)
+    if cached is not None and time.time() - updated < STATS_CACHE_TTL:
+        return cached
+    requested_at = time.time()
+    commands.put(kind, {})
+    while time.time() - requested_at < timeout:
+        await asyncio.sleep(0.5)
+        value, updated = events.get_state(kind)
+        if value is not None and updated >= requested_at:
+            return value
+    return cached
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
@@ -271,6 +427,7 @@ This bot monitors your IVASMS account and forwards SMS to this chat.
 /status - Check bot status
 /stats - View account statistics
 /check - Manually check for SMS
+/board - Pin a live status board (/board off to stop)
 /help - Show this help
 
 ** Join our channel:** @pyxuss_sms
@@ -285,14 +442,18 @@ This bot monitors your IVASMS account and forwards SMS to this chat.
     )
 
 async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    state = monitor_state()
+    # Only a separate scraper process can be down while the bot keeps answering
+    scraper_line = f"\n **Scraper:** {state['scraper']}" if "scraper" in state else ""
     status_text = f"""
 ** Bot Status:**
 
  **Running:** Yes
- **Logged in:** {' Yes' if monitor.logged_in else ' No'}
- **SMS Tracked:** {len(monitor.last_sms)}
+ **Logged in:** {' Yes' if state['logged_in'] else ' No'}
+ **SMS Tracked:** {state['sms_tracked']}
  **Users:** {len(bot_users)}
- **Login Attempts:** {monitor.login_attempts}
+ **Login Attempts:** {state['login_attempts']}
+ **Circuit:** {state['circuit']}{scraper_line}
 
 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 {get_powered_by()}
@@ -301,31 +462,125 @@ async def status(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = await update.message.reply_text(" Fetching stats...")
-    stats_text = monitor.get_stats()
+    if RUN_MODE == "bot":
+        stats_text = await request_from_scraper("stats") or " Scraper is not responding"
+    else:
+        stats_text = await flight.do("get_stats", monitor.get_stats, ttl=STATS_CACHE_TTL)
     await msg.edit_text(f"** Account Statistics:**\n\n{stats_text}", parse_mode='Markdown')
 
 async def check(update: Update, context: ContextTypes.DEFAULT_TYPE):
     msg = await update.message.reply_text(" Checking for new SMS...")
     
-    sms_list = monitor.check_sms()
+    if RUN_MODE == "bot":
+        # The scraper polls immediately and new SMS arrive through the event queue
+        commands.put("check", {})
+        await msg.edit_text(" Check requested, new SMS will be forwarded here.")
+        return
+    
+    # check_sms only returns SMS nobody has seen yet, so a cached result would re-show
+    # delivered SMS as new; join a poll already in flight but never reuse one
+    sms_list = await flight.do("check_sms", monitor.check_sms, ttl=0)
     
     if sms_list:
+        await msg.edit_text(f" Found {len(sms_list)} new SMS, forwarding them to all users.")
+        # Same path as the monitor's SMS, so every subscriber and CHAT_ID gets each one once
         for sms in sms_list:
-            sms_text = f"""
- **New SMS**
-
- **From:** `{sms['from']}`
- **Message:** 
-`{sms['message']}`
- **Time:** {sms['time']}
-
-{get_powered_by()}
-"""
-            await update.message.reply_text(sms_text, parse_mode='Markdown')
-        await msg.delete()
+            if monitor.claim(sms):
+                await coalescer.add(sms)
     else:
         await msg.edit_text(" No new SMS messages found.")
 
+def code_span(text):
+    """Markdown `code` span; a backtick inside would end it early and break parsing"""
+    return "`" + str(text).replace("`", "'") + "`"
+
+def render_board():
+    """Text of the live board from the latest scraper state"""
+    state = monitor_state()
+    ranges = state.get("ranges", [])
+    lines = ["** Live Board**", ""]
+    if state.get("scraper", "Up") != "Up":
+        lines.extend([f"**Scraper:** {state['scraper']}", ""])
+    if ranges:
+        for r in ranges:
+            lines.append(f"{code_span(r['range_name'])}: {r['count']} SMS, {r['revenue']:.2f}")
+        total = sum(r["count"] for r in ranges)
+        revenue = sum(r["revenue"] for r in ranges)
+        lines.append(f"**Total:** {total} SMS, {revenue:.2f}")
+    else:
+        lines.append("No ranges yet")
+    
+    lines.extend(["", "**Recent SMS:**"])
+    if recent_sms:
+        for sms in recent_sms:
+            lines.append(f"{sms['time']} {code_span(sms['from'])}: {code_span(sms['message'][:60])}")
+    else:
+        lines.append("None yet")
+    
+    lines.extend(["", get_powered_by()])
+    return "\n".join(lines)
+
+async def board(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    chat_id = update.effective_chat.id
+    
+    if context.args and context.args[0].lower() == "off":
+        message_id = boards.pop(chat_id, None)
+        board_texts.pop(chat_id, None)
+        if message_id:
+            try:
+                await context.bot.unpin_chat_message(chat_id=chat_id, message_id=message_id)
+            except Exception as e:
+                logger.warning(f"[BOARD] Could not unpin in {chat_id}: {e}")
+        await update.message.reply_text(" Live board turned off.")
+        return
+    
+    text = render_board()
+    msg = await update.message.reply_text(text, parse_mode='Markdown')
+    boards[chat_id] = msg.message_id
+    board_texts[chat_id] = text
+    try:
+        await context.bot.pin_chat_message(chat_id=chat_id, message_id=msg.message_id, disable_notification=True)
+    except Exception as e:
+        logger.warning(f"[BOARD] Could not pin in {chat_id}: {e}")
+
+async def board_loop(app):
+    """Debounced board updates: at most one edit per chat per BOARD_INTERVAL, and only on change"""
+    while True:
+        await asyncio.sleep(BOARD_INTERVAL)
+        if not boards:
+            continue
+        
+        text = render_board()
+        for chat_id, message_id in list(boards.items()):
+            if board_texts.get(chat_id) == text:
+                continue
+            try:
+                await app.bot.edit_message_text(text, chat_id=chat_id, message_id=message_id, parse_mode='Markdown')
+                board_texts[chat_id] = text
+            except RetryAfter as e:
+                logger.warning(f"[BOARD] Flood control, pausing {e.retry_after}s")
+                await asyncio.sleep(e.retry_after)
+            except BadRequest as e:
+                error = str(e).lower()
+                if "not modified" in error:
+                    board_texts[chat_id] = text
+                elif "message to edit not found" in error or "message can't be edited" in error:
+                    # The board message was deleted or is no longer editable
+                    logger.warning(f"[BOARD] Dropping board in {chat_id}: {e}")
+                    boards.pop(chat_id, None)
+                    board_texts.pop(chat_id, None)
+                elif "can't parse entities" in error:
+                    # Something in the text still trips the Markdown parser; show it plain
+                    try:
+                        await app.bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+                        board_texts[chat_id] = text
+                    except Exception as e:
+                        logger.error(f"[BOARD] Failed to update {chat_id}: {e}")
+                else:
+                    logger.error(f"[BOARD] Failed to update {chat_id}: {e}")
+            except Exception as e:
+                logger.error(f"[BOARD] Failed to update {chat_id}: {e}")
+
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     help_text = f"""
 ** Available Commands:**
@@ -334,12 +589,13 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 /status - Check bot status
 /stats - View account stats
 /check - Manually check SMS
+/board - Live status board
 /help - Show this help
 
 ** Tips:**
- Bot automatically checks for SMS every 45-90 seconds
- New SMS are forwarded to this chat
- Contact admin for support
+• Bot automatically checks for SMS every 45-90 seconds
+• New SMS are forwarded to this chat
+• Contact admin for support
 
 {get_powered_by()}
 """
@@ -377,74 +633,326 @@ async def broadcast(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.error(f"Update {update} caused error {context.error}")
 
-async def monitor_loop(app):
-    """Background task to monitor SMS"""
-    await asyncio.sleep(10)  # Wait for bot to start
+def format_sms_batch(sms_list):
+    """Messages for a batch: the usual card for a single SMS, size-limited digests for more"""
+    if len(sms_list) == 1:
+        sms = sms_list[0]
+        return [f"""
+ **New SMS Received**
+
+ **From:** {code_span(sms['from'])}
+ **Message:** 
+{code_span(sms['message'])}
+ **Time:** {sms['time']}
+
+{get_powered_by()}
+"""]
+    header = f" **{len(sms_list)} New SMS Received**"
+    room = entry_room(header, get_powered_by())
+    entries = []
+    for sms in sms_list:
+        prefix = f"{sms['time']} {code_span(sms['from'])}: "
+        message = sms['message']
+        # Shorten before wrapping, so a cut never leaves a code span open
+        if len(prefix) + len(message) + 2 > room:
+            message = message[:room - len(prefix) - 5] + "..."
+        entries.append(prefix + code_span(message))
+    return build_digests(entries, header, get_powered_by())
+
+async def send_markdown(bot, chat_id, text):
+    """Send with Markdown, falling back to plain text if Telegram cannot parse it"""
+    try:
+        return await bot.send_message(chat_id=chat_id, text=text, parse_mode='Markdown')
+    except BadRequest as e:
+        if "can't parse entities" not in str(e).lower():
+            raise
+        logger.warning(f"Markdown rejected for {chat_id}, sending plain text: {e}")
+        return await bot.send_message(chat_id=chat_id, text=text)
+
+async def deliver_batch(app, sms_list):
+    """Send a batch of SMS to every bot user and the main chat.
+
+    Raises if nobody accepted it, so the caller can keep the SMS (unacked in
+    split mode) and try again instead of treating the batch as delivered.
+    """
+    texts = format_sms_batch(sms_list)
+    recipients = 0
+    accepted = 0
+    
+    # Send to all users
+    for user_id in bot_users:
+        recipients += 1
+        for text in texts:
+            try:
+                await send_markdown(app.bot, user_id, text)
+                accepted += 1
+                await asyncio.sleep(0.5)  # Rate limiting
+            except Exception as e:
+                logger.error(f"Failed to send to {user_id}: {e}")
+    
+    # Also send to main chat if set
+    chat_id = os.getenv("CHAT_ID")
+    if chat_id:
+        recipients += 1
+        for text in texts:
+            try:
+                await send_markdown(app.bot, chat_id, text)
+                accepted += 1
+            except:
+                pass
+    
+    if recipients and not accepted:
+        raise RuntimeError(f"No recipient accepted {len(sms_list)} SMS")
+    recent_sms.extendleft(sms_list)
+
+async def deliver_sms(app, sms):
+    """Send one SMS to every bot user and the main chat"""
+    await deliver_batch(app, [sms])
+
+async def pause(seconds, wake=None):
+    """Sleep, returning early on shutdown or when wake is set"""
+    waiters = [asyncio.ensure_future(shutdown_event.wait())]
+    if wake:
+        waiters.append(asyncio.ensure_future(wake.wait()))
+    await asyncio.wait(waiters, timeout=seconds, return_when=asyncio.FIRST_COMPLETED)
+    for waiter in waiters:
+        waiter.cancel()
+    if wake:
+        wake.clear()
+
+async def monitor_loop(deliver, wake=None):
+    """Background task to monitor SMS, handing each new one to deliver(sms); returns on shutdown"""
+    await pause(10)  # Wait for bot to start
     logger.info("[MONITOR] Starting monitoring loop")
+    failures = 0
     
-    while True:
+    while not shutdown_event.is_set():
         try:
-            # Ensure we're logged in
+            # Ensure we're logged in, waiting out an open circuit instead of hammering /login
             if not monitor.logged_in:
-                if monitor.login_attempts < 5:
-                    monitor.login()
-                else:
-                    logger.warning("[MONITOR] Too many failed login attempts, waiting 5 minutes...")
-                    await asyncio.sleep(300)
-                    monitor.login_attempts = 0
+                wait_time = monitor.breaker.retry_after()
+                if wait_time > 0:
+                    logger.warning(f"[MONITOR] Circuit open, waiting {wait_time:.0f}s before next login")
+                    await pause(wait_time)
                     continue
+                await flight.do("login", monitor.login, ttl=0)
             
-            # Check for new SMS
-            sms_list = monitor.check_sms()
+            # Check for new SMS, joining a /check already in flight but never reusing a cached result
+            sms_list = await flight.do("check_sms", monitor.check_sms, ttl=0)
             
             if sms_list:
                 logger.info(f"[MONITOR] Found {len(sms_list)} new SMS")
                 for sms in sms_list:
-                    sms_text = f"""
- **New SMS Received**
-
- **From:** `{sms['from']}`
- **Message:** 
-`{sms['message']}`
- **Time:** {sms['time']}
-
-{get_powered_by()}
-"""
-                    # Send to all users
-                    for user_id in bot_users:
-                        try:
-                            await app.bot.send_message(
-                                chat_id=user_id,
-                                text=sms_text,
-                                parse_mode='Markdown'
-                            )
-                            await asyncio.sleep(0.5)  # Rate limiting
-                        except Exception as e:
-                            logger.error(f"Failed to send to {user_id}: {e}")
-                    
-                    # Also send to main chat if set
-                    chat_id = os.getenv("CHAT_ID")
-                    if chat_id:
-                        try:
-                            await app.bot.send_message(
-                                chat_id=chat_id,
-                                text=sms_text,
-                                parse_mode='Markdown'
-                            )
-                        except:
-                            pass
+                    # A /check that joined this poll may have delivered it already
+                    if monitor.claim(sms):
+                        await deliver(sms)
             
             # Random wait between checks (45-90 seconds)
             wait_time = random.randint(45, 90)
             logger.info(f"[MONITOR] Next check in {wait_time}s")
-            await asyncio.sleep(wait_time)
+            failures = 0
+            # A /check from the bot process cuts the wait short
+            await pause(wait_time, wake)
             
         except Exception as e:
-            logger.error(f"[MONITOR] Error: {e}")
-            await asyncio.sleep(60)
+            failures += 1
+            retry_in = POLICIES["session"].delay(failures)
+            logger.error(f"[MONITOR] Error: {e}. Retrying in {retry_in:.1f}s")
+            await pause(retry_in)
+    
+    logger.info("[MONITOR] Stopped polling")
+
+async def publish_sms(sms):
+    """Scraper-side deliver: hand the SMS to the bot process through the queue"""
+    events.put("sms", sms)
+
+async def publish_stats():
+    """Scrape account stats for the bot process and publish them"""
+    try:
+        stats_text = await flight.do("get_stats", monitor.get_stats, ttl=STATS_CACHE_TTL)
+        events.set_state("stats", stats_text)
+    except Exception as e:
+        logger.error(f"[SCRAPER] Stats error: {e}")
+
+async def scraper_command_loop(wake):
+    """Serve commands from the bot process and publish the scraper's state every second"""
+    stats_tasks = set()
+    while True:
+        try:
+            events.set_state("monitor", monitor_state())
+            handled = []
+            for event_id, kind, payload in commands.get():
+                if kind == "check":
+                    wake.set()
+                elif kind == "stats":
+                    # A stats scrape can take minutes with retries; keep the heartbeat going meanwhile
+                    task = asyncio.create_task(publish_stats())
+                    stats_tasks.add(task)
+                    task.add_done_callback(stats_tasks.discard)
+                handled.append(event_id)
+            commands.ack(handled)
+        except Exception as e:
+            logger.error(f"[SCRAPER] Command error: {e}")
+        await asyncio.sleep(1)
+
+async def delivery_loop(app):
+    """Bot-side consumer: forward queued SMS, acking each one only after it is sent"""
+    logger.info("[BOT] Consuming SMS events from the scraper")
+    pending_ids = set()  # events waiting in the coalescer, not yet acked
+    
+    def done(event_id):
+        def ack(sent):
+            pending_ids.discard(event_id)
+            if sent:
+                events.ack([event_id])
+        return ack
+    
+    while not shutdown_event.is_set():
+        try:
+            for event_id, kind, payload in events.get():
+                if event_id in pending_ids:
+                    continue
+                if kind == "sms":
+                    pending_ids.add(event_id)
+                    await coalescer.add(payload, done(event_id))
+                else:
+                    events.ack([event_id])
+        except Exception as e:
+            logger.error(f"[BOT] Delivery error: {e}")
+        await pause(1)
+
+def save_state():
+    """Checkpoint subscribers, dedup state, range counters and the session for a warm restart"""
+    data = {"saved_at": datetime.now().isoformat(), "run_mode": RUN_MODE}
+    if RUN_MODE != "scraper":
+        data["bot_users"] = sorted(bot_users)
+        data["boards"] = {str(chat_id): message_id for chat_id, message_id in boards.items()}
+        # In split mode unsent SMS are still unacked in the event queue
+        data["outbox"] = coalescer.unsent() if coalescer and RUN_MODE == "all" else []
+    if RUN_MODE != "bot":
+        # A poll may commit from its worker thread at any moment; read its results in one go
+        with monitor.state_lock:
+            data["monitor"] = {
+                "undelivered": list(monitor.undelivered),
+                "last_sms": dict(monitor.last_sms),
+                "range_counts": monitor.range_counts and dict(monitor.range_counts),
+                "ranges": monitor.ranges,
+                "from_date": monitor.from_date,
+                "to_date": monitor.to_date,
+            }
+        data["monitor"].update({
+            "logged_in": monitor.logged_in,
+            "cookies": export_cookies(monitor.session),
+            "csrf_token": monitor.csrf_token,
+        })
+    try:
+        save_checkpoint(CHECKPOINT_PATH, data)
+    except Exception as e:
+        logger.error(f"[CHECKPOINT] Failed to save: {e}")
+
+def restore_state():
+    """Load the last checkpoint; returns SMS that were still waiting to be sent"""
+    data = load_checkpoint(CHECKPOINT_PATH)
+    if not data:
+        return []
+    
+    outbox = data.get("outbox", [])
+    bot_users.update(data.get("bot_users", []))
+    boards.update({int(chat_id): message_id for chat_id, message_id in data.get("boards", {}).items()})
+    
+    saved = data.get("monitor")
+    if saved and RUN_MODE != "bot":
+        import_cookies(monitor.session, saved["cookies"])
+        # Trust the saved session; an expired one is caught by the next poll and re-logged in
+        monitor.logged_in = saved["logged_in"]
+        monitor.csrf_token = saved["csrf_token"]
+        monitor.last_sms = saved["last_sms"]
+        # SMS the poll found but nobody delivered; a digest being sent may hold some of them too
+        monitor.undelivered = saved.get("undelivered", [])
+        queued = {sms.get('id') for sms in outbox}
+        outbox += [sms for sms in monitor.undelivered if sms['id'] not in queued]
+        monitor.range_counts = saved["range_counts"]
+        monitor.ranges = saved["ranges"]
+        monitor.from_date, monitor.to_date = saved["from_date"], saved["to_date"]
+    
+    logger.info(f"[CHECKPOINT] Restored state from {data['saved_at']}: {len(bot_users)} user(s), {len(outbox)} unsent SMS")
+    return outbox
+
+async def checkpoint_loop():
+    """Refresh the checkpoint periodically so even a hard kill loses little"""
+    while not shutdown_event.is_set():
+        await pause(CHECKPOINT_INTERVAL)
+        save_state()
+
+def install_signal_handlers():
+    """Turn SIGTERM (deploys on Render/Heroku) and SIGINT into a graceful shutdown"""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, shutdown_event.set)
+        except NotImplementedError:
+            # Windows has no add_signal_handler; Ctrl+C still raises KeyboardInterrupt
+            pass
+
+async def drain(tasks, deadline):
+    """Let tasks finish until the deadline, then cancel whatever is left.
+
+    A poll still running in its worker thread is left alone: check_sms commits
+    its counters and SMS together, so the checkpoint sees either both or neither.
+    """
+    if tasks:
+        done, pending = await asyncio.wait(tasks, timeout=max(0.0, deadline - time.monotonic()))
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    if coalescer:
+        try:
+            # Also waits for a digest the window timer is already sending
+            await asyncio.wait_for(coalescer.flush(), timeout=max(0.1, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            logger.warning(f"[SHUTDOWN] Deadline hit with {len(coalescer.unsent())} SMS unsent, checkpointing them")
+
+async def run_scraper():
+    """Scraper-only process: poll IVASMS and publish events, no Telegram connection"""
+    logger.info(f"[SCRAPER] Starting, publishing to {QUEUE_PATH}")
+    wake = asyncio.Event()
+    helpers = [asyncio.create_task(scraper_command_loop(wake)), asyncio.create_task(checkpoint_loop())]
+    await monitor_loop(publish_sms, wake)
+    
+    logger.info("[SCRAPER] Shutting down...")
+    for task in helpers:
+        task.cancel()
+    save_state()
 
 async def main():
     """Main function"""
+    global events, commands, coalescer, CHECKPOINT_PATH
+    if RUN_MODE not in ("all", "scraper", "bot"):
+        logger.error(f"Unknown RUN_MODE {RUN_MODE!r}, expected all, scraper or bot")
+        sys.exit(1)
+    if RUN_MODE != "all":
+        events = LocalQueue(QUEUE_PATH, "events")
+        commands = LocalQueue(QUEUE_PATH, "commands")
+    CHECKPOINT_PATH = CHECKPOINT_PATH or f"checkpoint_{RUN_MODE}.json"
+    install_signal_handlers()
+    
+    # Start health server in background (the web-facing bot side owns PORT)
+    if RUN_MODE != "scraper":
+        health_thread = threading.Thread(target=run_health_server, daemon=True)
+        health_thread.start()
+    
+    # Warm restart from the last checkpoint; log in only if there is no usable session
+    outbox = restore_state()
+    if RUN_MODE != "bot" and not monitor.logged_in:
+        await flight.do("login", monitor.login, ttl=0)
+    
+    if RUN_MODE == "scraper":
+        for sms in outbox:
+            await publish_sms(sms)
+            monitor.remember(sms)
+        await run_scraper()
+        return
+    
     bot_token = os.getenv("BOT_TOKEN")
     if not bot_token:
         logger.error("BOT_TOKEN not set!")
@@ -460,6 +968,7 @@ async def main():
     application.add_handler(CommandHandler("status", status))
     application.add_handler(CommandHandler("stats", stats))
     application.add_handler(CommandHandler("check", check))
+    application.add_handler(CommandHandler("board", board))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("broadcast", broadcast))
     
@@ -470,18 +979,37 @@ async def main():
     await application.start()
     await application.updater.start_polling()
     
-    # Start monitoring loop
-    asyncio.create_task(monitor_loop(application))
+    # Start monitoring loop, or consume the scraper process's events in split mode
+    coalescer = Coalescer(lambda batch: deliver_batch(application, batch), DIGEST_WINDOW, DIGEST_BURST)
+    for sms in outbox:
+        await coalescer.add(sms)
+        if RUN_MODE == "all":
+            monitor.remember(sms)
+    if RUN_MODE == "bot":
+        workers = [asyncio.create_task(delivery_loop(application))]
+    else:
+        workers = [asyncio.create_task(monitor_loop(coalescer.add))]
+    helpers = [asyncio.create_task(board_loop(application)), asyncio.create_task(checkpoint_loop())]
     
     logger.info("[BOT] Running!")
     
-    # Keep running
-    try:
-        while True:
-            await asyncio.sleep(3600)
-    except KeyboardInterrupt:
-        logger.info("[BOT] Shutting down...")
-        await application.stop()
+    # Keep running until SIGTERM/SIGINT
+    await shutdown_event.wait()
+    logger.info("[BOT] Shutting down...")
+    
+    # Stop polling, drain outbound sends within the deadline, then checkpoint
+    deadline = time.monotonic() + SHUTDOWN_DEADLINE
+    for task in helpers:
+        task.cancel()
+    await drain(workers, deadline)
+    save_state()
+    
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    logger.info("[BOT] Stopped")
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        RUN_MODE = sys.argv[1].lower()
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,241 @@
+import re
+from datetime import datetime, timedelta
+from bs4 import BeautifulSoup
+from transport import accept_encoding
+
+# Seconds to wait for any single IVASMS response
+REQUEST_TIMEOUT = 30
+
+# Common headers
+BASE_HEADERS = {
+    "Host": "www.ivasms.com",
+    "Cache-Control": "max-age=0",
+    "Sec-Ch-Ua": '"Not)A;Brand";v="8", "Chromium";v="138"',
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"Windows"',
+    "Upgrade-Insecure-Requests": "1",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/138.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-User": "?1",
+    "Sec-Fetch-Dest": "document",
+    "Accept-Encoding": accept_encoding(),
+    "Accept-Language": "en-GB,en;q=0.9",
+    "Priority": "u=0, i",
+    "Connection": "keep-alive"
+}
+def payload_1(session):
+    """Send GET request to /login to retrieve initial tokens."""
+    url = "https://www.ivasms.com/login"
+    headers = BASE_HEADERS.copy()
+    response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    
+    token_match = re.search(r'<input type="hidden" name="_token" value="([^"]+)"', response.text)
+    if not token_match:
+        raise ValueError("Could not find _token in response")
+    return {"_token": token_match.group(1)}
+
+def payload_2(session, _token, email, password):
+    """Send POST request to /login with credentials."""
+    url = "https://www.ivasms.com/login"
+    headers = BASE_HEADERS.copy()
+    headers.update({
+        "Content-Type": "application/x-www-form-urlencoded",
+        "Sec-Fetch-Site": "same-origin",
+        "Referer": "https://www.ivasms.com/login"
+    })
+    
+    data = {
+        "_token": _token,
+        "email": email,
+        "password": password,
+        "remember": "on",
+        "g-recaptcha-response": "",
+        "submit": "register"
+    }
+    
+    response = session.post(url, headers=headers, data=data, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    if response.url.endswith("/login"):
+        raise ValueError("Login failed, redirected back to /login")
+    return response
+
+def payload_3(session):
+    """Send GET request to /sms/received to get statistics page."""
+    url = "https://www.ivasms.com/portal/sms/received"
+    headers = BASE_HEADERS.copy()
+    headers.update({
+        "Sec-Fetch-Site": "same-origin",
+        "Referer": "https://www.ivasms.com/portal"
+    })
+    
+    response = session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    
+    # Extract CSRF token from response
+    token_match = re.search(r'<meta name="csrf-token" content="([^"]+)">', response.text)
+    if not token_match:
+        raise ValueError("Could not find CSRF token in /sms/received response")
+    return response, token_match.group(1)
+
+def payload_4(session, csrf_token, from_date, to_date):
+    """Send POST request to /sms/received/getsms to fetch SMS statistics."""
+    url = "https://www.ivasms.com/portal/sms/received/getsms"
+    headers = BASE_HEADERS.copy()
+    headers.update({
+        "Content-Type": "multipart/form-data; boundary=----WebKitFormBoundaryhkp0qMozYkZV6Ham",
+        "X-Requested-With": "XMLHttpRequest",
+        "Sec-Fetch-Site": "same-origin",
+        "Sec-Fetch-Mode": "cors",
+        "Sec-Fetch-Dest": "empty",
+        "Referer": "https://www.ivasms.com/portal/sms/received",
+        "Origin": "https://www.ivasms.com"
+    })
+    
+    data = (
+        "------WebKitFormBoundaryhkp0qMozYkZV6Ham\r\n"
+        "Content-Disposition: form-data; name=\"from\"\r\n"
+        "\r\n"
+        f"{from_date}\r\n"
+        f"------WebKitFormBoundaryhkp0qMozYkZV6Ham\r\n"
+        "Content-Disposition: form-data; name=\"to\"\r\n"
+        "\r\n"
+        f"{to_date}\r\n"
+        f"------WebKitFormBoundaryhkp0qMozYkZV6Ham\r\n"
+        "Content-Disposition: form-data; name=\"_token\"\r\n"
+        "\r\n"
+        f"{csrf_token}\r\n"
+        "------WebKitFormBoundaryhkp0qMozYkZV6Ham--\r\n"
+    )
+    
+    response = session.post(url, headers=headers, data=data, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response
+def parse_statistics(response_text):
+    """Parse SMS statistics from response and return range data."""
+    soup = BeautifulSoup(response_text, 'html.parser')
+    ranges = []
+    
+    # Check for "no SMS" message
+    no_sms = soup.find('p', id='messageFlash')
+    if no_sms and "You do not have any SMS" in no_sms.text:
+        return ranges
+    
+    # Find all range cards
+    range_cards = soup.find_all('div', class_='card card-body mb-1 pointer')
+    for card in range_cards:
+        cols = card.find_all('div', class_=re.compile(r'col-sm-\d+|col-\d+'))
+        if len(cols) >= 5:
+            range_name = cols[0].text.strip()
+            count_text = cols[1].find('p').text.strip()
+            paid_text = cols[2].find('p').text.strip()
+            unpaid_text = cols[3].find('p').text.strip()
+            revenue_span = cols[4].find('span', class_='currency_cdr')
+            revenue_text = revenue_span.text.strip() if revenue_span else "0.0"
+            
+            # Convert to appropriate types, with fallback to 0
+            try:
+                count = int(count_text) if count_text else 0
+                paid = int(paid_text) if paid_text else 0
+                unpaid = int(unpaid_text) if unpaid_text else 0
+                revenue = float(revenue_text) if revenue_text else 0.0
+            except ValueError as e:
+                count, paid, unpaid, revenue = 0, 0, 0, 0.0
+            
+            # Extract range_id from onclick
+            onclick = card.get('onclick', '')
+            range_id_match = re.search(r"getDetials\('([^']+)'\)", onclick)
+            range_id = range_id_match.group(1) if range_id_match else range_name
+            
+            ranges.append({
+                "range_name": range_name,
+                "range_id": range_id,
+                "count": count,
+                "paid": paid,
+                "unpaid": unpaid,
+                "revenue": revenue
+            })
+    
+    return ranges
+def payload_5(session, csrf_token, to_date, range_name, from_date=""):
+    """Send POST request to /sms/received/getsms/number to get numbers for a range."""
+    url = "https://www.ivasms.com/portal/sms/received/getsms/number"
+    headers = BASE_HEADERS.copy()
+    headers.update({
+        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+        "X-Requested-With": "XMLHttpRequest",
+        "Sec-Fetch-Site": "same-origin",
+        "Sec-Fetch-Mode": "cors",
+        "Sec-Fetch-Dest": "empty",
+        "Referer": "https://www.ivasms.com/portal/sms/received",
+        "Origin": "https://www.ivasms.com"
+    })
+    
+    data = {
+        "_token": csrf_token,
+        "start": from_date,
+        "end": to_date,
+        "range": range_name
+    }
+    
+    response = session.post(url, headers=headers, data=data, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response
+
+def parse_numbers(response_text):
+    """Parse numbers from the range response."""
+    soup = BeautifulSoup(response_text, 'html.parser')
+    numbers = []
+    
+    number_divs = soup.find_all('div', class_='card card-body border-bottom bg-100 p-2 rounded-0')
+    for div in number_divs:
+        onclick = div.find('div', class_=re.compile(r'col-sm-\d+|col-\d+')).get('onclick', '')
+        match = re.search(r"'([^']+)','([^']+)'", onclick)
+        if match:
+            number, number_id = match.groups()
+            numbers.append({"number": number, "number_id": number_id})
+    
+    return numbers
+
+def payload_6(session, csrf_token, to_date, number, range_name, from_date=""):
+    """Send POST request to /sms/received/getsms/number/sms to get message details."""
+    url = "https://www.ivasms.com/portal/sms/received/getsms/number/sms"
+    headers = BASE_HEADERS.copy()
+    headers.update({
+        "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
+        "X-Requested-With": "XMLHttpRequest",
+        "Sec-Fetch-Site": "same-origin",
+        "Sec-Fetch-Mode": "cors",
+        "Sec-Fetch-Dest": "empty",
+        "Referer": "https://www.ivasms.com/portal/sms/received",
+        "Origin": "https://www.ivasms.com"
+    })
+    
+    data = {
+        "_token": csrf_token,
+        "start": from_date,
+        "end": to_date,
+        "Number": number,
+        "Range": range_name
+    }
+    
+    response = session.post(url, headers=headers, data=data, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response
+
+def parse_message(response_text):
+    """Parse message details from response."""
+    soup = BeautifulSoup(response_text, 'html.parser')
+    message_div = soup.find('div', class_='col-9 col-sm-6 text-center text-sm-start')
+    revenue_div = soup.find('div', class_='col-3 col-sm-2 text-center text-sm-start')
+    
+    message = message_div.find('p').text.strip() if message_div else "No message found"
+    revenue = revenue_div.find('span', class_='currency_cdr').text.strip() if revenue_div else "0.0"
+    return {"message": message, "revenue": revenue}
+
+def current_dates():
+    """Return today's (from_date, to_date) pair in the portal's date format."""
+    today = datetime.now()
+    return today.strftime("%m/%d/%Y"), (today + timedelta(days=1)).strftime("%m/%d/%Y")
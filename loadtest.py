@@ -0,0 +1,256 @@
+"""Load test for Telegram fan-out against a local fake Bot API.
+
+    python loadtest.py fanout --subscribers 1000
+    python loadtest.py broadcast --subscribers 5000
+
+A fan-out paces itself at 0.5s per subscriber (broadcast at 0.1s), so unless
+--timeout is given each run gets that pacing plus 30s of headroom.
+
+The fake server enforces Telegram-like limits (a global messages-per-second
+cap and a per-chat cap) and answers excess requests with 429 and retry_after,
+so the numbers reflect how the real send path copes with flood control.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from telegram import Bot
+from telegram.error import RetryAfter
+
+import index
+
+class FakeBotAPI:
+    """Minimal Bot API stand-in: getMe and sendMessage with Telegram-like rate limits"""
+    def __init__(self, global_rate=30.0, chat_interval=1.0):
+        self.global_rate = global_rate
+        self.chat_interval = chat_interval
+        self.lock = threading.Lock()
+        self.tokens = global_rate
+        self.refilled = time.monotonic()
+        self.last_chat_send = {}
+        self.accepted = []  # monotonic times messages were accepted
+        self.requests = 0
+        self.rejected = 0
+        self.message_id = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/bot"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def reset(self):
+        with self.lock:
+            self.accepted.clear()
+            self.last_chat_send.clear()
+            self.requests = self.rejected = 0
+
+    def admit(self, chat_id):
+        """Return 0 if the message may be sent now, else seconds to retry after"""
+        with self.lock:
+            now = time.monotonic()
+            self.requests += 1
+            self.tokens = min(self.global_rate, self.tokens + (now - self.refilled) * self.global_rate)
+            self.refilled = now
+            chat_wait = self.last_chat_send.get(chat_id, -self.chat_interval) + self.chat_interval - now
+            if self.tokens < 1 or chat_wait > 0:
+                self.rejected += 1
+                return max(1, int(chat_wait + 0.999))
+            self.tokens -= 1
+            self.last_chat_send[chat_id] = now
+            self.accepted.append(now)
+            self.message_id += 1
+            return 0
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if "json" in self.headers.get("Content-Type", ""):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = {k: v[0] for k, v in urllib.parse.parse_qs(body.decode()).items()}
+                method = self.path.rsplit("/", 1)[-1]
+
+                if method == "getMe":
+                    self.reply(200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}})
+                elif method == "sendMessage":
+                    chat_id = int(params.get("chat_id", 0))
+                    retry_after = api.admit(chat_id)
+                    if retry_after:
+                        self.reply(429, {
+                            "ok": False,
+                            "error_code": 429,
+                            "description": f"Too Many Requests: retry after {retry_after}",
+                            "parameters": {"retry_after": retry_after}
+                        })
+                    else:
+                        self.reply(200, {"ok": True, "result": {
+                            "message_id": api.message_id,
+                            "date": int(time.time()),
+                            "chat": {"id": chat_id, "type": "private"},
+                            "text": params.get("text", "")
+                        }})
+                else:
+                    self.reply(200, {"ok": True, "result": True})
+
+            do_GET = do_POST
+
+            def reply(self, code, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+# Seconds index.py waits between sends to consecutive subscribers
+PACING = {"fanout": 0.5, "broadcast": 0.1}
+
+class TimedBot:
+    """Bot wrapper that times every send_message round trip from the client side"""
+    def __init__(self, bot):
+        self.bot = bot
+        self.reset()
+
+    def reset(self):
+        self.latencies = []  # seconds per accepted send_message call
+        self.flood = 0  # calls that got 429 / RetryAfter
+        self.failed = 0  # calls that failed any other way
+
+    async def send_message(self, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            result = await self.bot.send_message(*args, **kwargs)
+        except RetryAfter:
+            self.flood += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        self.latencies.append(time.monotonic() - start)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.bot, name)
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+async def run_scenario(api, bot, scenario, subscribers, timeout):
+    """Fan one SMS (or one broadcast) out to `subscribers` users and time it"""
+    index.bot_users.clear()
+    index.bot_users.update(range(1, subscribers + 1))
+    api.reset()
+    bot.reset()
+
+    if scenario == "fanout":
+        sms = {"from": "12345", "message": "Load test code 000000", "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+        job = index.deliver_sms(SimpleNamespace(bot=bot), sms)
+    else:
+        async def reply_text(text, **kwargs):
+            pass
+        update = SimpleNamespace(
+            effective_user=SimpleNamespace(id=index.ADMIN_IDS[0]),
+            message=SimpleNamespace(reply_text=reply_text)
+        )
+        context = SimpleNamespace(args=["load", "test"], bot=bot)
+        job = index.broadcast(update, context)
+
+    start = time.monotonic()
+    completed = True
+    try:
+        await asyncio.wait_for(job, timeout=timeout)
+    except asyncio.TimeoutError:
+        completed = False
+    elapsed = time.monotonic() - start
+
+    latencies = list(bot.latencies)
+    # How long each subscriber waited from the start of the run, i.e. its place in the queue
+    waits = [t - start for t in api.accepted]
+    return {
+        "scenario": scenario,
+        "subscribers": subscribers,
+        "completed": completed,
+        "elapsed_s": round(elapsed, 2),
+        "timeout_s": round(timeout, 1),
+        "delivered": len(latencies),
+        "msgs_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "p99_s": round(percentile(latencies, 99), 3),
+        "wait_p50_s": round(percentile(waits, 50), 3),
+        "wait_p95_s": round(percentile(waits, 95), 3),
+        "wait_p99_s": round(percentile(waits, 99), 3),
+        "requests": api.requests,
+        "flood_429": bot.flood,
+        "failed_other": bot.failed,
+        "error_rate": round(api.rejected / api.requests, 4) if api.requests else 0.0,
+    }
+
+def print_report(result):
+    suffix = "" if result["completed"] else f" (timed out after {result['timeout_s']}s)"
+    print(f"{result['scenario']} to {result['subscribers']} subscribers{suffix}")
+    print(f"  delivered   {result['delivered']} in {result['elapsed_s']}s")
+    print(f"  throughput  {result['msgs_per_s']} msg/s")
+    print(f"  latency     p50 {result['p50_s']}s  p95 {result['p95_s']}s  p99 {result['p99_s']}s  (send_message round trip)")
+    print(f"  waited      p50 {result['wait_p50_s']}s  p95 {result['wait_p95_s']}s  p99 {result['wait_p99_s']}s  (since run start)")
+    print(f"  failures    {result['flood_429']} flood-controlled (429), {result['failed_other']} other")
+    print(f"  error rate  {result['error_rate'] * 100:.2f}% of {result['requests']} requests")
+
+async def main(args):
+    # Keep the load test away from the real main chat
+    os.environ.pop("CHAT_ID", None)
+
+    api = FakeBotAPI(args.global_rate, args.chat_interval)
+    api.start()
+    bot = TimedBot(Bot("123456:LOADTEST", base_url=api.base_url))
+    await bot.initialize()
+    try:
+        for subscribers in args.subscribers:
+            timeout = args.timeout or 30 + subscribers * PACING[args.scenario] * 1.2
+            result = await run_scenario(api, bot, args.scenario, subscribers, timeout)
+            if args.json:
+                print(json.dumps(result))
+            else:
+                print_report(result)
+    finally:
+        await bot.shutdown()
+        api.stop()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Telegram fan-out throughput against a fake Bot API.")
+    parser.add_argument("scenario", choices=["fanout", "broadcast"], help="monitor_loop SMS fan-out or the /broadcast handler")
+    parser.add_argument("--subscribers", type=int, nargs="+", default=[1000], help="subscriber counts to test")
+    parser.add_argument("--timeout", type=float, help="seconds to let one run go before cutting it off (default: scaled to --subscribers)")
+    parser.add_argument("--global-rate", type=float, default=30.0, help="fake API messages per second across all chats")
+    parser.add_argument("--chat-interval", type=float, default=1.0, help="fake API minimum seconds between messages to one chat")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per run")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,184 @@
+import asyncio
+import inspect
+import logging
+import random
+import threading
+import time
+
+import requests
+
+from scheduler import BACKFILL, COMMAND, DRILLDOWN, POLL, scheduler
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised when a call is refused because the account's circuit is open"""
+    def __init__(self, name, retry_after):
+        super().__init__(f"Circuit for {name} is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Exponential backoff with full jitter: uniform in [0, min(max_delay, base * 2**attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+class RetryPolicy:
+    """How often and how quickly to retry one kind of IVASMS call, and its scheduling priority"""
+    def __init__(self, attempts=3, base_delay=1.0, max_delay=30.0, retry_on=(requests.RequestException,), priority=COMMAND):
+        self.attempts = attempts
+        self.priority = priority
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+
+    def delay(self, attempt):
+        return backoff_delay(attempt, self.base_delay, self.max_delay)
+
+    def retryable(self, error):
+        """Whether another attempt could help; a 4xx other than 429 (e.g. 419 for an expired CSRF token) will not"""
+        if not isinstance(error, self.retry_on):
+            return False
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        return not (status and 400 <= status < 500 and status != 429)
+
+# Per-endpoint policies. Polls retry fast so a blip costs seconds, logins retry
+# sparingly so an outage or bad credentials do not hammer /login.
+POLICIES = {
+    "login": RetryPolicy(attempts=2, base_delay=2.0, max_delay=10.0, priority=POLL),
+    "poll": RetryPolicy(attempts=4, base_delay=0.5, max_delay=8.0, priority=POLL),
+    "drilldown": RetryPolicy(attempts=3, base_delay=0.5, max_delay=5.0, priority=DRILLDOWN),
+    "page": RetryPolicy(attempts=3, base_delay=1.0, max_delay=10.0, priority=COMMAND),
+    "backfill": RetryPolicy(attempts=3, base_delay=1.0, max_delay=10.0, priority=BACKFILL),
+    # Delay between whole session restarts after the per-call retries give up
+    "session": RetryPolicy(attempts=1, base_delay=2.0, max_delay=300.0),
+}
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker for one IVASMS account.
+
+    closed: calls pass. open: calls are refused until reset_timeout elapses.
+    half_open: one trial call passes; success closes the circuit, failure
+    re-opens it with a doubled timeout (capped at max_reset_timeout). A trial
+    that reports neither within reset_timeout is given up and another allowed.
+    A failure is one call that exhausted its retries, not one attempt.
+    """
+    def __init__(self, name, failure_threshold=5, reset_timeout=15.0, max_reset_timeout=600.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def retry_after(self):
+        """Seconds until the circuit lets a (new) trial call through"""
+        if self.state == "closed":
+            return 0.0
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                # opened_at now marks the trial's start, so callers waiting on it get a real retry_after
+                self.opened_at = time.monotonic()
+                logger.info(f"[CIRCUIT] {self.name} half-open, allowing a trial call")
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"[CIRCUIT] {self.name} closed")
+            self.state = "closed"
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open":
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+            elif self.failures < self.failure_threshold:
+                return
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            logger.warning(f"[CIRCUIT] {self.name} open for {self.reset_timeout:.0f}s after {self.failures} failure(s)")
+
+_breakers = {}
+
+def get_breaker(account):
+    """Return the shared circuit breaker for an account, creating it on first use"""
+    if account not in _breakers:
+        _breakers[account] = CircuitBreaker(str(account))
+    return _breakers[account]
+
+def _budget(breaker, account, priority, policy):
+    """Resolve the scheduler account and priority for a call"""
+    if account is None:
+        account = breaker.name if breaker else "default"
+    return account, policy.priority if priority is None else priority
+
+def call(func, *args, policy, breaker=None, account=None, priority=None, **kwargs):
+    """Call func with retries and backoff, blocking the current thread between attempts.
+
+    Every attempt waits for a slot from the global request scheduler; the
+    account defaults to the breaker's and the priority to the policy's.
+    """
+    account, priority = _budget(breaker, account, priority, policy)
+    for attempt in range(policy.attempts):
+        # Only the first attempt asks the breaker: retries of an admitted (possibly
+        # half-open trial) call must run to the end so its outcome is recorded
+        if breaker and attempt == 0 and not breaker.allow():
+            raise CircuitOpenError(breaker.name, breaker.retry_after())
+        scheduler.acquire(account, priority)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            retryable = policy.retryable(e)
+            if not retryable or attempt == policy.attempts - 1:
+                # One failure per call that gave up, and only for errors worth retrying
+                if breaker and retryable:
+                    breaker.record_failure()
+                raise
+            delay = policy.delay(attempt)
+            logger.warning(f"[RETRY] {getattr(func, '__name__', func)} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+        else:
+            if breaker:
+                breaker.record_success()
+            return result
+
+async def call_async(func, *args, policy, breaker=None, account=None, priority=None, **kwargs):
+    """Async counterpart of call(); blocking functions and scheduler waits run in a worker thread"""
+    account, priority = _budget(breaker, account, priority, policy)
+    for attempt in range(policy.attempts):
+        # Only the first attempt asks the breaker: retries of an admitted (possibly
+        # half-open trial) call must run to the end so its outcome is recorded
+        if breaker and attempt == 0 and not breaker.allow():
+            raise CircuitOpenError(breaker.name, breaker.retry_after())
+        await asyncio.to_thread(scheduler.acquire, account, priority)
+        try:
+            if inspect.iscoroutinefunction(func):
+                result = await func(*args, **kwargs)
+            else:
+                result = await asyncio.to_thread(func, *args, **kwargs)
+        except Exception as e:
+            retryable = policy.retryable(e)
+            if not retryable or attempt == policy.attempts - 1:
+                # One failure per call that gave up, and only for errors worth retrying
+                if breaker and retryable:
+                    breaker.record_failure()
+                raise
+            delay = policy.delay(attempt)
+            logger.warning(f"[RETRY] {getattr(func, '__name__', func)} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        else:
+            if breaker:
+                breaker.record_success()
+            return result
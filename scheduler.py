@@ -0,0 +1,95 @@
+import itertools
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, most latency-sensitive first
+POLL = 0  # detection polls (and the logins they depend on)
+DRILLDOWN = 1  # fetching the SMS behind a changed range
+COMMAND = 2  # user commands such as /stats
+BACKFILL = 3  # history exports and other bulk work
+
+class TokenBucket:
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self):
+        """Seconds until one token is available"""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+class RequestScheduler:
+    """Global and per-account requests-per-second budget with priority classes.
+
+    Threads block in acquire() until both the global bucket and their
+    account's bucket have a token. When several are waiting, the one with the
+    highest priority class (lowest number) goes first, FIFO within a class.
+    """
+    def __init__(self, global_rate=5.0, account_rate=2.0):
+        self.global_bucket = TokenBucket(global_rate)
+        self.account_rate = account_rate
+        self.accounts = {}
+        self._waiting = []  # (priority, seq, account) of blocked callers
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def set_rates(self, global_rate=None, account_rate=None):
+        with self._cond:
+            if global_rate:
+                self.global_bucket = TokenBucket(global_rate)
+            if account_rate:
+                self.account_rate = account_rate
+                self.accounts.clear()
+            self._cond.notify_all()
+
+    def _bucket(self, account):
+        if account not in self.accounts:
+            self.accounts[account] = TokenBucket(self.account_rate)
+        return self.accounts[account]
+
+    def _next_eligible(self):
+        """The highest-priority waiter whose account has budget left"""
+        for entry in sorted(self._waiting):
+            if self._bucket(entry[2]).tokens >= 1:
+                return entry
+        return None
+
+    def acquire(self, account="default", priority=COMMAND):
+        """Block until a request for account at this priority may be sent"""
+        with self._cond:
+            entry = (priority, next(self._seq), account)
+            self._waiting.append(entry)
+            started = time.monotonic()
+            while True:
+                now = time.monotonic()
+                self.global_bucket.refill(now)
+                for bucket in self.accounts.values():
+                    bucket.refill(now)
+                bucket = self._bucket(account)
+
+                if self.global_bucket.tokens >= 1 and self._next_eligible() == entry:
+                    self.global_bucket.tokens -= 1
+                    bucket.tokens -= 1
+                    self._waiting.remove(entry)
+                    self._cond.notify_all()
+                    waited = now - started
+                    if waited > 1:
+                        logger.debug(f"[SCHEDULER] {account} priority {priority} waited {waited:.1f}s")
+                    return
+
+                timeout = max(self.global_bucket.wait_time(), bucket.wait_time(), 0.01)
+                self._cond.wait(timeout)
+
+scheduler = RequestScheduler(
+    float(os.getenv("IVASMS_GLOBAL_RPS", "5")),
+    float(os.getenv("IVASMS_ACCOUNT_RPS", "2"))
+)
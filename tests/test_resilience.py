@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import resilience
+from resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, call
+
+@pytest.fixture(autouse=True)
+def no_budget(monkeypatch):
+    monkeypatch.setattr(resilience.scheduler, "acquire", lambda account, priority: None)
+
+def fail():
+    raise requests.Timeout("down")
+
+def test_failed_half_open_trial_reopens_with_doubled_timeout(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("acct", failure_threshold=1, reset_timeout=1.0, max_reset_timeout=4.0)
+    policy = RetryPolicy(attempts=3, base_delay=0.0, max_delay=0.0)
+
+    with pytest.raises(requests.Timeout):
+        call(fail, policy=policy, breaker=breaker)
+    assert breaker.state == "open"
+
+    for expected in (2.0, 4.0, 4.0):
+        now[0] += breaker.reset_timeout
+        with pytest.raises(requests.Timeout):
+            call(fail, policy=policy, breaker=breaker)
+        assert breaker.state == "open"
+        assert breaker.reset_timeout == expected
+
+    with pytest.raises(CircuitOpenError):
+        call(fail, policy=policy, breaker=breaker)
+
+def test_one_failure_per_exhausted_call():
+    breaker = CircuitBreaker("acct", failure_threshold=5)
+    policy = RetryPolicy(attempts=4, base_delay=0.0, max_delay=0.0)
+    with pytest.raises(requests.Timeout):
+        call(fail, policy=policy, breaker=breaker)
+    assert breaker.failures == 1
+    assert breaker.state == "closed"
+
+def test_client_errors_are_not_retried_or_counted():
+    breaker = CircuitBreaker("acct", failure_threshold=1)
+    policy = RetryPolicy(attempts=4, base_delay=0.0, max_delay=0.0)
+    attempts = []
+
+    def expired_token():
+        attempts.append(1)
+        response = requests.Response()
+        response.status_code = 419
+        raise requests.HTTPError("419 Client Error", response=response)
+
+    with pytest.raises(requests.HTTPError):
+        call(expired_token, policy=policy, breaker=breaker)
+    assert len(attempts) == 1
+    assert breaker.state == "closed"
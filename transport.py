@@ -0,0 +1,119 @@
+import importlib.util
+import logging
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# "http1" (requests) or "http2" (httpx, needs `pip install httpx[http2]`)
+TRANSPORT = os.getenv("IVASMS_TRANSPORT", "http1").lower()
+# Connections kept open per host, and how long an idle one may live
+POOL_SIZE = int(os.getenv("IVASMS_POOL_SIZE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("IVASMS_KEEPALIVE_EXPIRY", "120"))
+
+# Headers that are connection-specific and forbidden in HTTP/2
+HOP_BY_HOP = {"connection", "host", "keep-alive", "proxy-connection", "transfer-encoding", "upgrade"}
+
+def accept_encoding():
+    """Only advertise the encodings we can actually decode"""
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi"):
+        return "gzip, deflate, br"
+    return "gzip, deflate"
+
+class HTTPXResponse:
+    """Make an httpx response look like the requests responses the payloads expect"""
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.http_version = response.http_version
+
+    @property
+    def text(self):
+        return self._response.text
+
+    @property
+    def content(self):
+        return self._response.content
+
+    def json(self):
+        return self._response.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+class HTTP2Session:
+    """requests.Session-compatible wrapper around an HTTP/2 httpx.Client.
+
+    All requests to a host share one multiplexed connection. httpx errors are
+    re-raised as requests exceptions so retry policies treat both transports alike.
+    """
+    def __init__(self, http1=True):
+        import httpx
+        self._httpx = httpx
+        self.client = httpx.Client(
+            http2=True,
+            http1=http1,
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE, keepalive_expiry=KEEPALIVE_EXPIRY),
+        )
+
+    def request(self, method, url, headers=None, data=None, timeout=None, allow_redirects=True, **kwargs):
+        headers = {k: v for k, v in (headers or {}).items() if k.lower() not in HOP_BY_HOP}
+        if isinstance(data, (str, bytes)):
+            kwargs["content"] = data
+        elif data is not None:
+            kwargs["data"] = data
+        try:
+            response = self.client.request(
+                method, url, headers=headers, timeout=timeout, follow_redirects=allow_redirects, **kwargs
+            )
+        except self._httpx.TimeoutException as e:
+            raise requests.Timeout(str(e)) from e
+        except self._httpx.TransportError as e:
+            raise requests.ConnectionError(str(e)) from e
+        return HTTPXResponse(response)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+def export_cookies(session):
+    """Session cookies as plain dicts, so a restarted process can reuse the login"""
+    jar = session.client.cookies.jar if isinstance(session, HTTP2Session) else session.cookies
+    return [{"name": c.name, "value": c.value, "domain": c.domain, "path": c.path} for c in jar]
+
+def import_cookies(session, cookies):
+    """Load cookies saved by export_cookies into a session of either transport"""
+    jar = session.client.cookies if isinstance(session, HTTP2Session) else session.cookies
+    for c in cookies:
+        jar.set(c["name"], c["value"], domain=c["domain"], path=c["path"])
+
+def make_session(transport=None):
+    """Create the HTTP session used for IVASMS traffic"""
+    transport = (transport or TRANSPORT).lower()
+    if transport == "http2":
+        if importlib.util.find_spec("httpx") and importlib.util.find_spec("h2"):
+            return HTTP2Session()
+        logger.warning("[TRANSPORT] httpx[http2] is not installed, falling back to HTTP/1.1")
+
+    session = requests.Session()
+    # Reuse keep-alive connections across threads; retries are handled by resilience.call
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session